@@ -5,6 +5,7 @@ from routes.bucket_routes import router as bucket_router
 from routes.file_routes import router as file_router
 from routes.metadata_routes import router as metadata_router
 from routes.search_routes import router as search_router
+from routes.export_routes import router as export_router
 import logging
 
 # Setup logging
@@ -21,6 +22,7 @@ app.include_router(bucket_router)
 app.include_router(file_router)
 app.include_router(metadata_router)
 app.include_router(search_router)
+app.include_router(export_router)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,116 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from utils.s3_utils import s3_client, throttle_controller, lister
+from typing import Dict, Iterator, List
+import csv
+import io
+import json
+import zlib
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+EXPORT_FIELDS = ['Key', 'Size', 'LastModified', 'ETag', 'StorageClass']
+
+@router.get("/export/{bucket_name}")
+async def export_listing(
+    bucket_name: str,
+    prefix: str = "",
+    export_format: str = Query("csv", alias="format"),
+    include_content_type: bool = False,
+    include_tags: bool = False,
+    compress: bool = True
+):
+    if export_format not in ('csv', 'ndjson'):
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {export_format}")
+    try:
+        s3_client.head_bucket(Bucket=bucket_name)
+    except s3_client.exceptions.ClientError as e:
+        logger.error(f"Error exporting listing for {bucket_name}/{prefix}: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    fields = EXPORT_FIELDS + (['ContentType'] if include_content_type else []) + (['Tags'] if include_tags else [])
+    rows = _iter_rows(bucket_name, prefix, include_content_type, include_tags)
+    body = _iter_csv(rows, fields) if export_format == 'csv' else _iter_ndjson(rows)
+    filename = f"{bucket_name}-listing.{export_format}"
+    media_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    if compress:
+        body = _gzip(body)
+        filename += '.gz'
+        media_type = 'application/gzip'
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+def _iter_rows(bucket_name: str, prefix: str, include_content_type: bool, include_tags: bool) -> Iterator[Dict]:
+    """Yield one row per object, a listing page at a time."""
+
+    def enrich(key):
+        row = {}
+        try:
+            if include_content_type:
+                row['ContentType'] = s3_client.head_object(Bucket=bucket_name, Key=key).get('ContentType', '')
+            if include_tags:
+                tag_response = s3_client.get_object_tagging(Bucket=bucket_name, Key=key)
+                row['Tags'] = [t['Value'] for t in tag_response.get('TagSet', [])]
+        except s3_client.exceptions.ClientError as e:
+            logger.error(f"Error enriching export row for {bucket_name}/{key}: {e}")
+        return row
+
+    try:
+        # Rows go out in listing arrival order; an ordered merge would buffer most of the bucket
+        for contents in lister.iter_batches(bucket_name, prefix):
+            extras = [{}] * len(contents)
+            if include_content_type or include_tags:
+                extras = throttle_controller.map(bucket_name, enrich, [obj['Key'] for obj in contents])
+            for obj, extra in zip(contents, extras):
+                row = {
+                    'Key': obj['Key'],
+                    'Size': obj['Size'],
+                    'LastModified': obj['LastModified'].isoformat(),
+                    'ETag': obj.get('ETag', '').strip('"'),
+                    'StorageClass': obj.get('StorageClass', 'STANDARD')
+                }
+                if include_content_type:
+                    row['ContentType'] = extra.get('ContentType', '')
+                if include_tags:
+                    row['Tags'] = extra.get('Tags', [])
+                yield row
+    except s3_client.exceptions.ClientError as e:
+        # Headers are already sent, so abort the stream: the client sees a broken
+        # transfer and the gzip output has no trailer, instead of a valid file missing rows
+        logger.error(f"Error listing {bucket_name}/{prefix} for export: {e}")
+        raise
+
+def _iter_csv(rows: Iterator[Dict], fields: List[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+    for count, row in enumerate(rows, 1):
+        if 'Tags' in row:
+            row['Tags'] = ';'.join(row['Tags'])
+        writer.writerow(row)
+        if count % 1000 == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def _iter_ndjson(rows: Iterator[Dict]) -> Iterator[str]:
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(row) + '\n')
+        if len(lines) == 1000:
+            yield ''.join(lines)
+            lines = []
+    yield ''.join(lines)
+
+def _gzip(chunks: Iterator[str]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -1,11 +1,16 @@
 from fastapi import APIRouter, Request, Form, File, UploadFile, HTTPException
 from fastapi.responses import HTMLResponse, StreamingResponse, FileResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.templating import Jinja2Templates
-from utils.s3_utils import s3_client, generate_presigned_url, get_file_metadata
-from utils.helpers import sanitize_filename, list_folder_contents
+from utils.s3_utils import (
+    s3_client, generate_presigned_url, get_file_metadata, throttle_controller,
+    delete_prefix, delete_object, delete_objects, copy_object, invalidate_object, invalidate_objects, invalidate_bucket,
+    downloader, archive_uploader
+)
+from utils.helpers import sanitize_filename, summarize_keys, list_folder_contents
 import mimetypes
-import io
 import zipfile
+import tarfile
 import os
 import logging
 
@@ -29,6 +34,7 @@ async def upload_file(request: Request, bucket_name: str, prefix: str = Form("")
             file_key,
             ExtraArgs={'ContentType': content_type}
         )
+        invalidate_object(bucket_name, file_key)
         return templates.TemplateResponse("success.html", {
             "request": request,
             "message": f"File {sanitized_filename} uploaded successfully"
@@ -42,6 +48,40 @@ async def upload_file(request: Request, bucket_name: str, prefix: str = Form("")
         logger.error(error_msg)
         raise HTTPException(status_code=500, detail=error_msg)
 
+@router.post("/upload_extract/{bucket_name}", response_class=HTMLResponse)
+async def upload_extract(request: Request, bucket_name: str, prefix: str = Form(""), file: UploadFile = File(...)):
+    if not archive_uploader.is_supported(file.filename):
+        raise HTTPException(status_code=400, detail=f"Unsupported archive type: {file.filename}")
+    try:
+        logger.debug(f"Extracting archive {file.filename} into {bucket_name}/{prefix}")
+        keys, skipped = await run_in_threadpool(archive_uploader.upload, file.file, file.filename, bucket_name, prefix)
+        message = f"Extracted {len(keys)} file(s) from {file.filename}"
+        if skipped:
+            # Every skipped path is logged by the uploader; the page only lists the first few
+            message += f"; skipped {len(skipped)} with unsafe or duplicate paths: {summarize_keys(skipped)}"
+        return templates.TemplateResponse("success.html", {
+            "request": request,
+            "message": message
+        })
+    except s3_client.exceptions.ClientError as e:
+        error_msg = f"Error extracting {file.filename} to {bucket_name}/{prefix}: {e.response['Error']['Message']}"
+        logger.error(error_msg)
+        raise HTTPException(status_code=400, detail=error_msg)
+    except (zipfile.BadZipFile, tarfile.TarError) as e:
+        error_msg = f"Invalid archive {file.filename}: {str(e)}"
+        logger.error(error_msg)
+        raise HTTPException(status_code=400, detail=error_msg)
+    except Exception as e:
+        error_msg = f"Unexpected error during extraction: {str(e)}"
+        logger.error(error_msg)
+        raise HTTPException(status_code=500, detail=error_msg)
+    finally:
+        # Even a partial extraction changes the listing
+        if prefix:
+            invalidate_object(bucket_name, prefix)
+        else:
+            invalidate_bucket(bucket_name)
+
 @router.get("/preview/{bucket_name}/{file_key:path}", response_class=HTMLResponse)
 async def preview_file(request: Request, bucket_name: str, file_key: str, prefix: str = ""):
     try:
@@ -113,11 +153,14 @@ async def preview_file(request: Request, bucket_name: str, file_key: str, prefix
 @router.get("/download/{bucket_name}/{file_key:path}")
 async def download_file(bucket_name: str, file_key: str):
     try:
-        response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
+        head = s3_client.head_object(Bucket=bucket_name, Key=file_key)
         return StreamingResponse(
-            io.BytesIO(response['Body'].read()),
-            media_type=response['ContentType'],
-            headers={"Content-Disposition": f"attachment; filename={os.path.basename(file_key)}"}
+            downloader.iter_object(bucket_name, file_key, head['ContentLength'], head['ETag']),
+            media_type=head.get('ContentType', 'application/octet-stream'),
+            headers={
+                "Content-Disposition": f"attachment; filename={os.path.basename(file_key)}",
+                "Content-Length": str(head['ContentLength'])
+            }
         )
     except s3_client.exceptions.ClientError as e:
         logger.error(f"Error downloading file {bucket_name}/{file_key}: {e}")
@@ -244,7 +287,7 @@ async def share_file_post(request: Request, bucket_name: str, file_key: str, pre
 @router.post("/delete_file/{bucket_name}/{file_key:path}", response_class=HTMLResponse)
 async def delete_file(request: Request, bucket_name: str, file_key: str):
     try:
-        s3_client.delete_object(Bucket=bucket_name, Key=file_key)
+        delete_object(bucket_name, file_key)
         return templates.TemplateResponse("success.html", {
             "request": request,
             "message": f"File {file_key} deleted successfully"
@@ -267,14 +310,13 @@ async def confirm_delete_folder(request: Request, bucket_name: str, folder_key:
 @router.post("/delete_folder/{bucket_name}/{folder_key:path}", response_class=HTMLResponse)
 async def delete_folder(request: Request, bucket_name: str, folder_key: str):
     try:
-        paginator = s3_client.get_paginator('list_objects_v2')
-        for page in paginator.paginate(Bucket=bucket_name, Prefix=folder_key):
-            for obj in page.get('Contents', []):
-                s3_client.delete_object(Bucket=bucket_name, Key=obj['Key'])
-        s3_client.delete_object(Bucket=bucket_name, Key=folder_key)
+        failed = await run_in_threadpool(delete_prefix, bucket_name, folder_key)
+        message = f"Folder {folder_key} deleted successfully"
+        if failed:
+            message = f"Folder {folder_key} deleted except {len(failed)} object(s): {summarize_keys(failed)}"
         return templates.TemplateResponse("success.html", {
             "request": request,
-            "message": f"Folder {folder_key} deleted successfully"
+            "message": message
         })
     except s3_client.exceptions.ClientError as e:
         logger.error(f"Error deleting folder {bucket_name}/{folder_key}: {e}")
@@ -283,18 +325,20 @@ async def delete_folder(request: Request, bucket_name: str, folder_key: str):
 @router.post("/bulk_delete/{bucket_name}", response_class=HTMLResponse)
 async def bulk_delete(request: Request, bucket_name: str, keys: list[str] = Form(...)):
     try:
-        for key in keys:
-            if key.endswith('/'):
-                paginator = s3_client.get_paginator('list_objects_v2')
-                for page in paginator.paginate(Bucket=bucket_name, Prefix=key):
-                    for obj in page.get('Contents', []):
-                        s3_client.delete_object(Bucket=bucket_name, Key=obj['Key'])
-                s3_client.delete_object(Bucket=bucket_name, Key=key)
-            else:
-                s3_client.delete_object(Bucket=bucket_name, Key=key)
+        def delete_keys():
+            failed = delete_objects(bucket_name, [key for key in keys if not key.endswith('/')])
+            for key in keys:
+                if key.endswith('/'):
+                    failed += delete_prefix(bucket_name, key)
+            return failed
+        # Throttled batches wait and back off; keep that off the event loop
+        failed = await run_in_threadpool(delete_keys)
+        message = f"{len(keys)} item(s) deleted successfully"
+        if failed:
+            message = f"{len(keys)} item(s) deleted except {len(failed)} object(s): {summarize_keys(failed)}"
         return templates.TemplateResponse("success.html", {
             "request": request,
-            "message": f"{len(keys)} item(s) deleted successfully"
+            "message": message
         })
     except s3_client.exceptions.ClientError as e:
         logger.error(f"Error in bulk delete for {bucket_name}: {e}")
@@ -303,9 +347,17 @@ async def bulk_delete(request: Request, bucket_name: str, keys: list[str] = Form
 @router.post("/bulk_copy/{bucket_name}", response_class=HTMLResponse)
 async def bulk_copy(request: Request, bucket_name: str, keys: list[str] = Form(...), destination: str = Form(...)):
     try:
-        for key in keys:
-            dest_key = f"{destination.rstrip('/')}/{os.path.basename(key.rstrip('/'))}"
-            s3_client.copy_object(Bucket=bucket_name, CopySource={'Bucket': bucket_name, 'Key': key}, Key=dest_key)
+        dest_keys = {key: f"{destination.rstrip('/')}/{os.path.basename(key.rstrip('/'))}" for key in keys}
+
+        def copy_key(key):
+            s3_client.copy_object(Bucket=bucket_name, CopySource={'Bucket': bucket_name, 'Key': key}, Key=dest_keys[key])
+
+        def copy_keys():
+            try:
+                throttle_controller.map(bucket_name, copy_key, keys)
+            finally:
+                invalidate_objects(bucket_name, dest_keys.values())
+        await run_in_threadpool(copy_keys)
         return templates.TemplateResponse("success.html", {
             "request": request,
             "message": f"{len(keys)} item(s) copied to {destination}"
@@ -317,20 +369,28 @@ async def bulk_copy(request: Request, bucket_name: str, keys: list[str] = Form(.
 @router.post("/bulk_move/{bucket_name}", response_class=HTMLResponse)
 async def bulk_move(request: Request, bucket_name: str, keys: list[str] = Form(...), destination: str = Form(...)):
     try:
-        for key in keys:
-            dest_key = f"{destination.rstrip('/')}/{os.path.basename(key.rstrip('/'))}"
-            s3_client.copy_object(Bucket=bucket_name, CopySource={'Bucket': bucket_name, 'Key': key}, Key=dest_key)
-            if key.endswith('/'):
-                paginator = s3_client.get_paginator('list_objects_v2')
-                for page in paginator.paginate(Bucket=bucket_name, Prefix=key):
-                    for obj in page.get('Contents', []):
-                        s3_client.delete_object(Bucket=bucket_name, Key=obj['Key'])
-                s3_client.delete_object(Bucket=bucket_name, Key=key)
-            else:
-                s3_client.delete_object(Bucket=bucket_name, Key=key)
+        dest_keys = {key: f"{destination.rstrip('/')}/{os.path.basename(key.rstrip('/'))}" for key in keys}
+
+        def copy_key(key):
+            s3_client.copy_object(Bucket=bucket_name, CopySource={'Bucket': bucket_name, 'Key': key}, Key=dest_keys[key])
+
+        def move_keys():
+            try:
+                throttle_controller.map(bucket_name, copy_key, keys)
+            finally:
+                invalidate_objects(bucket_name, dest_keys.values())
+            failed = delete_objects(bucket_name, [key for key in keys if not key.endswith('/')])
+            for key in keys:
+                if key.endswith('/'):
+                    failed += delete_prefix(bucket_name, key)
+            return failed
+        failed = await run_in_threadpool(move_keys)
+        message = f"{len(keys)} item(s) moved to {destination}"
+        if failed:
+            message += f"; {len(failed)} original(s) could not be deleted: {summarize_keys(failed)}"
         return templates.TemplateResponse("success.html", {
             "request": request,
-            "message": f"{len(keys)} item(s) moved to {destination}"
+            "message": message
         })
     except s3_client.exceptions.ClientError as e:
         logger.error(f"Error in bulk move for {bucket_name}: {e}")
@@ -340,18 +400,34 @@ async def bulk_move(request: Request, bucket_name: str, keys: list[str] = Form(.
 async def rename_object(request: Request, bucket_name: str, key: str, new_name: str = Form(...), prefix: str = Form("")):
     try:
         new_key = f"{prefix}{new_name}" if not key.endswith('/') else f"{prefix}{new_name}/"
-        s3_client.copy_object(Bucket=bucket_name, CopySource={'Bucket': bucket_name, 'Key': key}, Key=new_key)
-        if key.endswith('/'):
-            paginator = s3_client.get_paginator('list_objects_v2')
-            for page in paginator.paginate(Bucket=bucket_name, Prefix=key):
-                for obj in page.get('Contents', []):
-                    new_obj_key = obj['Key'].replace(key, new_key, 1)
-                    s3_client.copy_object(Bucket=bucket_name, CopySource={'Bucket': bucket_name, 'Key': obj['Key']}, Key=new_obj_key)
-                    s3_client.delete_object(Bucket=bucket_name, Key=obj['Key'])
-        s3_client.delete_object(Bucket=bucket_name, Key=key)
+
+        def copy_key(obj_key):
+            new_obj_key = obj_key.replace(key, new_key, 1)
+            s3_client.copy_object(Bucket=bucket_name, CopySource={'Bucket': bucket_name, 'Key': obj_key}, Key=new_obj_key)
+
+        def rename():
+            failed = []
+            try:
+                s3_client.copy_object(Bucket=bucket_name, CopySource={'Bucket': bucket_name, 'Key': key}, Key=new_key)
+                if key.endswith('/'):
+                    paginator = s3_client.get_paginator('list_objects_v2')
+                    for page in paginator.paginate(Bucket=bucket_name, Prefix=key):
+                        page_keys = [obj['Key'] for obj in page.get('Contents', [])]
+                        throttle_controller.map(bucket_name, copy_key, page_keys)
+                        # Copies have no batch API, but the originals go in one DeleteObjects per page
+                        failed += delete_objects(bucket_name, page_keys)
+                s3_client.delete_object(Bucket=bucket_name, Key=key)
+            finally:
+                # Evict once the move is over, so no load that saw it half done stays cached
+                invalidate_objects(bucket_name, [key, new_key])
+            return failed
+        failed = await run_in_threadpool(rename)
+        message = f"{'Folder' if key.endswith('/') else 'File'} {key} renamed to {new_key}"
+        if failed:
+            message += f"; {len(failed)} original(s) could not be deleted: {summarize_keys(failed)}"
         return templates.TemplateResponse("success.html", {
             "request": request,
-            "message": f"{'Folder' if key.endswith('/') else 'File'} {key} renamed to {new_key}"
+            "message": message
         })
     except s3_client.exceptions.ClientError as e:
         logger.error(f"Error renaming object {bucket_name}/{key}: {e}")
@@ -360,7 +436,7 @@ async def rename_object(request: Request, bucket_name: str, key: str, new_name:
 @router.post("/copy_file/{bucket_name}", response_class=HTMLResponse)
 async def copy_file(request: Request, bucket_name: str, file_key: str = Form(...), destination: str = Form(...)):
     try:
-        s3_client.copy_object(Bucket=bucket_name, CopySource={'Bucket': bucket_name, 'Key': file_key}, Key=destination)
+        copy_object(bucket_name, file_key, destination)
         return templates.TemplateResponse("success.html", {
             "request": request,
             "message": f"File copied to {destination}"
@@ -372,8 +448,8 @@ async def copy_file(request: Request, bucket_name: str, file_key: str = Form(...
 @router.post("/move_file/{bucket_name}", response_class=HTMLResponse)
 async def move_file(request: Request, bucket_name: str, file_key: str = Form(...), destination: str = Form(...)):
     try:
-        s3_client.copy_object(Bucket=bucket_name, CopySource={'Bucket': bucket_name, 'Key': file_key}, Key=destination)
-        s3_client.delete_object(Bucket=bucket_name, Key=file_key)
+        copy_object(bucket_name, file_key, destination)
+        delete_object(bucket_name, file_key)
         return templates.TemplateResponse("success.html", {
             "request": request,
             "message": f"File moved to {destination}"
@@ -385,17 +461,45 @@ async def move_file(request: Request, bucket_name: str, file_key: str = Form(...
 @router.post("/zip_files/{bucket_name}", response_class=FileResponse)
 async def zip_files(request: Request, bucket_name: str, files: list[str] = Form(...)):
     try:
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for file_key in files:
-                response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-                zip_file.writestr(os.path.basename(file_key), response['Body'].read())
-        zip_buffer.seek(0)
+        # HEAD everything up front so a missing file is still reported as a 400
+        heads = [(file_key, s3_client.head_object(Bucket=bucket_name, Key=file_key)) for file_key in files]
         return StreamingResponse(
-            zip_buffer,
+            _stream_zip(bucket_name, heads),
             media_type='application/zip',
             headers={"Content-Disposition": "attachment; filename=files.zip"}
         )
     except s3_client.exceptions.ClientError as e:
         logger.error(f"Error zipping files in {bucket_name}: {e}")
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e))
+
+class _ZipSink:
+    """Write-only buffer; without seek/tell, zipfile writes a streamable archive."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def _stream_zip(bucket_name: str, heads: list):
+    """Yield a ZIP archive of the given objects as their ranges arrive from S3."""
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        for file_key, head in heads:
+            size = head['ContentLength']
+            with zip_file.open(os.path.basename(file_key), 'w', force_zip64=size >= zipfile.ZIP64_LIMIT) as member:
+                for chunk in downloader.iter_object(bucket_name, file_key, size, head['ETag']):
+                    member.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+    yield sink.drain()
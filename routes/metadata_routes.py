@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Request, Form, HTTPException
 from fastapi.responses import HTMLResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.templating import Jinja2Templates
-from utils.s3_utils import s3_client, get_file_metadata
+from utils.s3_utils import s3_client, get_file_metadata, get_object_tags, invalidate_object
 import logging
 
 router = APIRouter()
@@ -10,11 +11,10 @@ logger = logging.getLogger(__name__)
 
 @router.get("/metadata/{bucket_name}/{file_key:path}", response_class=HTMLResponse)
 async def get_metadata(request: Request, bucket_name: str, file_key: str, prefix: str = ""):
-    metadata = get_file_metadata(bucket_name, file_key)
+    metadata = await run_in_threadpool(get_file_metadata, bucket_name, file_key)
     try:
-        tag_response = s3_client.get_object_tagging(Bucket=bucket_name, Key=file_key)
-        tags = [t['Value'] for t in tag_response.get('TagSet', [])]
-    except s3_client.exceptions.ClientError as e:
+        tags = await run_in_threadpool(get_object_tags, bucket_name, file_key)
+    except (s3_client.exceptions.ClientError, TimeoutError) as e:
         logger.error(f"Error getting tags for {bucket_name}/{file_key}: {e}")
         tags = []
     return templates.TemplateResponse("metadata.html", {
@@ -39,6 +39,7 @@ async def add_tag(request: Request, bucket_name: str, file_key: str, tag: str =
                 Key=file_key,
                 Tagging={'TagSet': tags}
             )
+            invalidate_object(bucket_name, file_key)
         return templates.TemplateResponse("success.html", {
             "request": request,
             "message": f"Tag '{tag}' added to {file_key}"
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Request, Form
 from fastapi.responses import HTMLResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.templating import Jinja2Templates
-from utils.s3_utils import s3_client, get_file_metadata
+from utils.s3_utils import s3_client, get_file_metadata, get_object_tags, throttle_controller, lister
 from datetime import datetime
 import logging
 
@@ -23,44 +24,54 @@ async def search_files(
     tag: str = Form(None)
 ):
     objects = []
-    paginator = s3_client.get_paginator('list_objects_v2')
+    start = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+    end = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+
+    def matches_remote_filters(key):
+        """Apply the filters that need a HEAD or tagging request."""
+        if content_type and get_file_metadata(bucket_name, key).get('content_type', 'N/A') != content_type:
+            return False
+        if tag:
+            try:
+                if tag not in get_object_tags(bucket_name, key):
+                    return False
+            except (s3_client.exceptions.ClientError, TimeoutError) as e:
+                logger.error(f"Error getting tags for {bucket_name}/{key}: {e}")
+                return False
+        return True
+
+    def collect_matches():
+        # Filter batches as they arrive and sort only the matches, instead of merging the whole listing
+        for batch in lister.iter_batches(bucket_name, prefix):
+            candidates = []
+            for obj in batch:
+                if search_query.lower() not in obj['Key'].lower():
+                    continue
+                if min_size is not None and obj['Size'] < min_size:
+                    continue
+                if max_size is not None and obj['Size'] > max_size:
+                    continue
+                if start and obj['LastModified'].date() < start:
+                    continue
+                if end and obj['LastModified'].date() > end:
+                    continue
+                candidates.append(obj)
+            if content_type or tag:
+                included = throttle_controller.map(bucket_name, matches_remote_filters, [obj['Key'] for obj in candidates])
+                candidates = [obj for obj, include in zip(candidates, included) if include]
+            for obj in candidates:
+                objects.append({
+                    'Key': obj['Key'],
+                    'LastModified': obj['LastModified'].strftime('%Y-%m-%d %H:%M:%S'),
+                    'Size': obj['Size'],
+                    'Type': 'File'
+                })
+        objects.sort(key=lambda obj: obj['Key'])
+
     try:
-        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
-            for obj in page.get('Contents', []):
-                if search_query.lower() in obj['Key'].lower():
-                    metadata = get_file_metadata(bucket_name, obj['Key'])
-                    include = True
-                    if min_size is not None and obj['Size'] < min_size:
-                        include = False
-                    if max_size is not None and obj['Size'] > max_size:
-                        include = False
-                    if start_date:
-                        start = datetime.strptime(start_date, '%Y-%m-%d')
-                        if obj['LastModified'].date() < start.date():
-                            include = False
-                    if end_date:
-                        end = datetime.strptime(end_date, '%Y-%m-%d')
-                        if obj['LastModified'].date() > end.date():
-                            include = False
-                    if content_type and metadata.get('content_type', 'N/A') != content_type:
-                        include = False
-                    if tag:
-                        try:
-                            tag_response = s3_client.get_object_tagging(Bucket=bucket_name, Key=obj['Key'])
-                            tags = {t['Key']: t['Value'] for t in tag_response.get('TagSet', [])}
-                            if tag not in tags.values():
-                                include = False
-                        except s3_client.exceptions.ClientError as e:
-                            logger.error(f"Error getting tags for {bucket_name}/{obj['Key']}: {e}")
-                            include = False
-                    if include:
-                        objects.append({
-                            'Key': obj['Key'],
-                            'LastModified': obj['LastModified'].strftime('%Y-%m-%d %H:%M:%S'),
-                            'Size': obj['Size'],
-                            'Type': 'File'
-                        })
-    except s3_client.exceptions.ClientError as e:
+        # Listing and enrichment block on throttling; keep them off the event loop
+        await run_in_threadpool(collect_matches)
+    except (s3_client.exceptions.ClientError, TimeoutError) as e:
         logger.error(f"Error searching objects in {bucket_name}/{prefix}: {e}")
     return templates.TemplateResponse("search.html", {
         "request": request,
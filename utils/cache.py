@@ -0,0 +1,254 @@
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+import logging
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class CacheBackend:
+    """Interface for caching S3 listings, stats, metadata and tags.
+
+    Keys are strings of the form ``namespace:bucket/key`` so that a write can
+    evict everything under a bucket or folder with a single prefix delete.
+
+    Deletes also record when each key or prefix was invalidated. A loader
+    passes the time it started reading S3 as ``started_at`` to ``set``, and
+    the value is dropped if the key was invalidated after that, so a slow
+    load cannot write back data that a concurrent write already made stale.
+    Invalidation records are kept for ``invalidation_horizon`` seconds, which
+    should exceed the longest load.
+    """
+
+    def __init__(self, default_ttl: float = 60.0, invalidation_horizon: float = 3600.0):
+        self.default_ttl = default_ttl
+        self.invalidation_horizon = invalidation_horizon
+
+    def get(self, key: str, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, started_at: Optional[float] = None):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def delete_prefix(self, prefix: str):
+        raise NotImplementedError
+
+    def delete_many(self, keys: Iterable[str] = (), prefixes: Iterable[str] = ()):
+        """Delete several keys and prefixes; backends override this to do it in one write."""
+        for key in keys:
+            self.delete(key)
+        for prefix in prefixes:
+            self.delete_prefix(prefix)
+
+    def clear(self):
+        raise NotImplementedError
+
+    def _expires_at(self, ttl: Optional[float]) -> float:
+        return time.time() + (self.default_ttl if ttl is None else ttl)
+
+class NullCache(CacheBackend):
+    """Cache that stores nothing, so every read goes to S3."""
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, started_at: Optional[float] = None):
+        pass
+
+    def delete(self, key: str):
+        pass
+
+    def delete_prefix(self, prefix: str):
+        pass
+
+    def clear(self):
+        pass
+
+class InProcessCache(CacheBackend):
+    """Dictionary cache private to one worker process.
+
+    Only safe with a single worker: evictions made by one worker never reach
+    the copies held by the others.
+    """
+
+    def __init__(self, default_ttl: float = 60.0, invalidation_horizon: float = 3600.0):
+        super().__init__(default_ttl, invalidation_horizon)
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._deleted_keys: Dict[str, float] = {}
+        self._deleted_prefixes: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return default
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, started_at: Optional[float] = None):
+        with self._lock:
+            if started_at is not None and self._invalidated_since(key, started_at):
+                logger.debug(f"Dropping cache entry {key} invalidated during its load")
+                return
+            self._entries[key] = (self._expires_at(ttl), value)
+
+    def delete(self, key: str):
+        self.delete_many(keys=(key,))
+
+    def delete_prefix(self, prefix: str):
+        self.delete_many(prefixes=(prefix,))
+
+    def delete_many(self, keys: Iterable[str] = (), prefixes: Iterable[str] = ()):
+        prefixes = tuple(prefixes)
+        with self._lock:
+            now = time.time()
+            for key in keys:
+                self._entries.pop(key, None)
+                self._deleted_keys[key] = now
+            if prefixes:
+                for key in [k for k in self._entries if k.startswith(prefixes)]:
+                    del self._entries[key]
+                for prefix in prefixes:
+                    self._deleted_prefixes[prefix] = now
+            self._prune()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._deleted_prefixes[''] = time.time()
+
+    def _invalidated_since(self, key: str, started_at: float) -> bool:
+        if self._deleted_keys.get(key, 0) >= started_at:
+            return True
+        # Look up each leading slice of the key rather than scanning every recorded prefix
+        return any(self._deleted_prefixes.get(key[:i], 0) >= started_at for i in range(len(key) + 1))
+
+    def _prune(self):
+        if random.random() < 0.01:
+            cutoff = time.time() - self.invalidation_horizon
+            for records in (self._deleted_keys, self._deleted_prefixes):
+                for key in [k for k, at in records.items() if at < cutoff]:
+                    del records[key]
+
+class SQLiteCache(CacheBackend):
+    """Cache shared by every worker on the host through one SQLite file in WAL mode.
+
+    All workers read and write the same tables, so an eviction made while
+    handling a write in one worker is immediately visible to the others, and
+    warm entries survive worker restarts.
+    """
+
+    def __init__(self, path: str, default_ttl: float = 60.0, invalidation_horizon: float = 3600.0, busy_timeout: float = 5.0):
+        super().__init__(default_ttl, invalidation_horizon)
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS invalidations ("
+            "key TEXT NOT NULL, is_prefix INTEGER NOT NULL, invalidated_at REAL NOT NULL, "
+            "PRIMARY KEY (key, is_prefix))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS invalidations_at ON invalidations (invalidated_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            row = self._connection().execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at >= ?",
+                (key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading cache entry {key}: {e}")
+            return default
+        return pickle.loads(row[0]) if row else default
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, started_at: Optional[float] = None):
+        value = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            conn = self._connection()
+            if started_at is None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, self._expires_at(ttl))
+                )
+            else:
+                # Check and write in one statement so an invalidation from another worker cannot slip in between
+                cursor = conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, expires_at) SELECT ?, ?, ? "
+                    "WHERE NOT EXISTS (SELECT 1 FROM invalidations WHERE invalidated_at >= ? AND ("
+                    "(is_prefix = 0 AND key = ?) OR (is_prefix = 1 AND substr(?, 1, length(key)) = key)))",
+                    (key, value, self._expires_at(ttl), started_at, key, key)
+                )
+                if cursor.rowcount == 0:
+                    logger.debug(f"Dropping cache entry {key} invalidated during its load")
+            if random.random() < 0.01:
+                conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+                conn.execute("DELETE FROM invalidations WHERE invalidated_at < ?", (time.time() - self.invalidation_horizon,))
+        except sqlite3.Error as e:
+            logger.error(f"Error writing cache entry {key}: {e}")
+
+    def delete(self, key: str):
+        self.delete_many(keys=(key,))
+
+    def delete_prefix(self, prefix: str):
+        self.delete_many(prefixes=(prefix,))
+
+    def delete_many(self, keys: Iterable[str] = (), prefixes: Iterable[str] = ()):
+        # One write transaction however many entries are evicted; writers are serialized across workers
+        keys, prefixes = list(keys), list(prefixes)
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                now = time.time()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO invalidations (key, is_prefix, invalidated_at) VALUES (?, ?, ?)",
+                    [(key, 0, now) for key in keys] + [(prefix, 1, now) for prefix in prefixes]
+                )
+                conn.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in keys])
+                # Range scan on the primary key instead of LIKE, which would need escaping
+                conn.executemany(
+                    "DELETE FROM cache WHERE key >= ? AND key < ?",
+                    [(prefix, prefix + '\U0010ffff') for prefix in prefixes]
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Error invalidating {len(keys)} cache key(s) and {len(prefixes)} prefix(es): {e}")
+
+    def clear(self):
+        self.delete_many(prefixes=('',))
+
+def create_cache(backend: str = "none", path: str = ".cache/s3_cache.db", default_ttl: float = 60.0) -> CacheBackend:
+    """Build the cache backend named in configuration."""
+    if backend == "none":
+        return NullCache(default_ttl)
+    if backend == "memory":
+        return InProcessCache(default_ttl)
+    if backend == "sqlite":
+        return SQLiteCache(path, default_ttl)
+    raise ValueError(f"Unknown cache backend: {backend}")
@@ -1,5 +1,6 @@
 import re
 import uuid
+import posixpath
 import logging
 from typing import List, Dict
 
@@ -8,6 +9,23 @@ def sanitize_filename(filename: str) -> str:
     sanitized = re.sub(r'[^a-zA-Z0-9._-]', '_', filename.strip())
     return sanitized if sanitized else f"file_{uuid.uuid4().hex}"
 
+def sanitize_member_path(path: str) -> str:
+    """Resolve an archive member path and sanitize it segment by segment.
+
+    Returns an empty string for paths that resolve to nothing or climb above
+    the archive root.
+    """
+    resolved = posixpath.normpath(path.replace('\\', '/').lstrip('/'))
+    if resolved in ('.', '..') or resolved.startswith('../'):
+        return ''
+    segments = [s for s in resolved.split('/') if s.strip()]
+    return '/'.join(sanitize_filename(s) for s in segments)
+
+def summarize_keys(keys: List[str], limit: int = 10) -> str:
+    """Join the first few keys for a message, noting how many more were left out."""
+    shown = ', '.join(keys[:limit])
+    return shown if len(keys) <= limit else f"{shown} and {len(keys) - limit} more"
+
 def list_folder_contents(bucket: str, prefix: str, s3_client) -> List[Dict]:
     """List contents of a folder in S3."""
     objects = []
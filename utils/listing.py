@@ -0,0 +1,233 @@
+import heapq
+import itertools
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Iterator, List, NamedTuple, Optional
+from utils.throttle import ThrottleController
+
+logger = logging.getLogger(__name__)
+
+# Split characters are picked from printable ASCII, which covers almost all keys
+_LOWEST = 0x1F
+_HIGHEST = 0x7F
+
+class Shard(NamedTuple):
+    """A slice of the keyspace: entries under prefix in (start_after, end]."""
+    low: str
+    prefix: str
+    delimiter: bool
+    start_after: Optional[str] = None
+    end: Optional[str] = None
+    token: Optional[str] = None
+
+def split_point(low: str, prefix: str, end: Optional[str]) -> Optional[str]:
+    """Return a key strictly between low and end (or the end of prefix), or None."""
+    i = len(prefix)
+    if end is not None:
+        i = len(prefix) + len(_common_prefix(low[len(prefix):], end[len(prefix):]))
+        if i >= len(end):
+            return None
+        low_c = ord(low[i]) if i < len(low) else _LOWEST
+        high_c = ord(end[i])
+        if high_c - low_c >= 2:
+            return low[:i] + chr((low_c + high_c) // 2)
+        if i >= len(low):
+            return None
+        # low[i] < end[i], so anything starting with low[:i + 1] is below end
+        i += 1
+    while True:
+        low_c = ord(low[i]) if i < len(low) else _LOWEST
+        mid_c = (low_c + _HIGHEST) // 2
+        if mid_c > low_c:
+            return low[:i] + chr(mid_c)
+        i += 1
+
+def split_points(names: List[str], prefix: str, end: Optional[str], limit: int) -> List[str]:
+    """Pick up to limit ascending pivots that split the range after a full page.
+
+    The position where the page's first and last keys diverge is where keys are
+    currently counting up; the character before it is the next to change. Fanning
+    out there over the characters seen in the page (e.g. the digits of
+    ``img_000999``) gives pieces of about one page each. When that character is
+    already at its top value the fan-out carries to the position before it.
+    Falls back to bisection.
+    """
+    first, last = names[0], names[-1]
+    varying = len(_common_prefix(first, last))
+    alphabet = sorted({name[varying] for name in names if len(name) > varying})
+    pivots = []
+    # Carry to more significant positions when the next one is already at its top value
+    for position in range(varying - 1, len(prefix) - 1, -1):
+        pivots = [last[:position] + c for c in alphabet if c > last[position]]
+        pivots = [pivot for pivot in pivots if end is None or pivot < end]
+        if pivots:
+            break
+    if not pivots:
+        pivot = split_point(last, prefix, end)
+        pivots = [pivot] if pivot is not None else []
+    if len(pivots) > limit:
+        step = len(pivots) / limit
+        pivots = [pivots[int(i * step)] for i in range(limit)]
+    return pivots
+
+def _common_prefix(a: str, b: str) -> str:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return a[:n]
+
+class ShardedLister:
+    """List a bucket prefix with many concurrent list_objects_v2 calls.
+
+    One plain page is listed first; a prefix that fits in it costs a single
+    request. Otherwise a delimiter listing of the rest of the prefix discovers
+    its top-level folders, and each folder becomes its own shard. Whenever a shard's page comes back truncated
+    and workers are idle, the rest of its key range is split at StartAfter
+    pivots between the last key seen and the end of the range. The split repeats
+    recursively, so even one flat prefix is listed by many workers at once.
+    Results are yielded as soon as they arrive, or merged into key order when
+    ``ordered`` is set. Once ``max_buffered`` pages are waiting on the merge,
+    only the lowest outstanding shard is listed and no more splits are made,
+    so the merge drains instead of buffering most of the keyspace.
+    """
+
+    def __init__(
+        self,
+        client,
+        max_workers: int = 16,
+        page_size: int = 1000,
+        max_buffered: Optional[int] = None,
+        throttle: Optional[ThrottleController] = None
+    ):
+        self.client = client
+        self.max_workers = max_workers
+        self.page_size = page_size
+        self.max_buffered = max_workers * 2 if max_buffered is None else max_buffered
+        self.throttle = throttle
+
+    def iter_objects(self, bucket: str, prefix: str = "", ordered: bool = False) -> Iterator[Dict]:
+        """Yield every object under bucket/prefix as returned in list_objects_v2 Contents."""
+        for batch in self.iter_batches(bucket, prefix, ordered):
+            yield from batch
+
+    def iter_batches(self, bucket: str, prefix: str = "", ordered: bool = False) -> Iterator[List[Dict]]:
+        """Yield the objects under bucket/prefix in batches of at most one page."""
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        running = {}
+        seen_prefixes = set()
+        ready = []
+        # Ordered mode only: shards held back while the merge is full, lowest first
+        pending = []
+        sequence = itertools.count()
+
+        def submit(shard):
+            running[executor.submit(self._list_page, bucket, shard)] = shard
+
+        def schedule(shard):
+            if ordered:
+                heapq.heappush(pending, (shard.low, next(sequence), shard))
+            else:
+                submit(shard)
+
+        try:
+            first = self._list_page(bucket, Shard(low=prefix, prefix=prefix, delimiter=False))
+            contents = first.get('Contents', [])
+            if contents:
+                # Nothing can sort below the first page, so it is safe to emit even when ordered
+                yield contents
+            if not first.get('IsTruncated') or not contents:
+                return
+            last = contents[-1]['Key']
+            schedule(Shard(low=last, prefix=prefix, delimiter=True, start_after=last))
+            while running or pending:
+                while pending and (
+                    len(ready) < self.max_buffered
+                    or not running
+                    or pending[0][0] < min(shard.low for shard in running.values())
+                ):
+                    submit(heapq.heappop(pending)[2])
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    shard = running.pop(future)
+                    busy = len(running) + len(pending)
+                    if ordered and len(ready) >= self.max_buffered:
+                        # Splitting would only add shards above the floor
+                        busy = self.max_workers
+                    batches, children = self._process_page(shard, future.result(), seen_prefixes, busy)
+                    for child in children:
+                        schedule(child)
+                    for batch in batches:
+                        if ordered:
+                            heapq.heappush(ready, (batch[0]['Key'], next(sequence), batch))
+                        else:
+                            yield batch
+                if ordered:
+                    # A batch is safe to emit once no unfinished shard can produce a smaller key
+                    lows = [shard.low for shard in running.values()] + [entry[0] for entry in pending]
+                    floor = min(lows, default=None)
+                    while ready and (floor is None or ready[0][0] < floor):
+                        yield heapq.heappop(ready)[2]
+        finally:
+            for future in running:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _list_page(self, bucket: str, shard: Shard) -> Dict:
+        params = {'Bucket': bucket, 'Prefix': shard.prefix, 'MaxKeys': self.page_size}
+        if shard.delimiter:
+            params['Delimiter'] = '/'
+        if shard.token:
+            params['ContinuationToken'] = shard.token
+        elif shard.start_after:
+            params['StartAfter'] = shard.start_after
+        if self.throttle:
+            return self.throttle.call(bucket, shard.prefix, self.client.list_objects_v2, **params)
+        return self.client.list_objects_v2(**params)
+
+    def _process_page(self, shard: Shard, page: Dict, seen_prefixes: set, busy: int):
+        """Turn one page into ordered batches of objects plus the shards that follow it."""
+        entries = [(obj['Key'], obj) for obj in page.get('Contents', [])]
+        entries += [(p['Prefix'], None) for p in page.get('CommonPrefixes', [])]
+        entries.sort(key=lambda entry: entry[0])
+        last = entries[-1][0] if entries else None
+        finished = not page.get('IsTruncated')
+        if shard.end is not None and entries and last > shard.end:
+            entries = [entry for entry in entries if entry[0] <= shard.end]
+            finished = True
+
+        batches = []
+        children = []
+        batch = []
+        for name, obj in entries:
+            if obj is not None:
+                batch.append(obj)
+                continue
+            if batch:
+                batches.append(batch)
+                batch = []
+            # A folder straddling a split pivot is reported by both halves
+            if name not in seen_prefixes:
+                seen_prefixes.add(name)
+                if shard.start_after and shard.start_after.startswith(name):
+                    # Part of this folder was already listed before the shard's range began
+                    children.append(Shard(low=shard.start_after, prefix=name, delimiter=False, start_after=shard.start_after))
+                else:
+                    children.append(Shard(low=name, prefix=name, delimiter=False))
+        if batch:
+            batches.append(batch)
+
+        if not finished and last is not None:
+            end = shard.end
+            idle = self.max_workers - busy - len(children)
+            if idle > 0:
+                pivots = split_points([name for name, _ in entries], shard.prefix, end, idle)
+                if pivots:
+                    logger.debug(f"Splitting listing of {shard.prefix} at {pivots}")
+                for start, stop in zip(pivots, pivots[1:] + [end]):
+                    children.append(shard._replace(low=start, start_after=start, end=stop, token=None))
+                if pivots:
+                    end = pivots[0]
+            children.append(shard._replace(low=last, end=end, token=page.get('NextContinuationToken')))
+        return batches, children
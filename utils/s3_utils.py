@@ -1,7 +1,15 @@
 import os
+import time
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from dotenv import load_dotenv
+from utils.throttle import ThrottleController, THROTTLE_ERROR_CODES
+from utils.cache import create_cache
+from utils.singleflight import SingleFlight
+from utils.transfer import RangedDownloader, ArchiveUploader
+from utils.listing import ShardedLister
+from typing import Dict, Iterable, List
 import logging
 
 # Load environment variables
@@ -14,6 +22,7 @@ logger = logging.getLogger(__name__)
 aws_access_key_id = os.getenv("AWS_ACCESS_KEY_ID")
 aws_secret_access_key = os.getenv("AWS_SECRET_ACCESS_KEY")
 aws_region = os.getenv("AWS_REGION", "us-east-1")
+max_concurrency = int(os.getenv("S3_MAX_CONCURRENCY", "64"))
 
 if not aws_access_key_id or not aws_secret_access_key:
     raise ValueError("AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY must be set in .env file")
@@ -23,38 +32,258 @@ try:
         's3',
         aws_access_key_id=aws_access_key_id,
         aws_secret_access_key=aws_secret_access_key,
-        region_name=aws_region
+        region_name=aws_region,
+        config=Config(max_pool_connections=max_concurrency)
     )
 except Exception as e:
     logger.error(f"Failed to initialize S3 client: {str(e)}")
     raise ValueError(f"Failed to initialize S3 client: {str(e)}")
 
+# Shared backpressure for bulk operations
+throttle_controller = ThrottleController(
+    initial_concurrency=int(os.getenv("S3_INITIAL_CONCURRENCY", "8")),
+    max_concurrency=max_concurrency,
+    max_rps=float(os.getenv("S3_MAX_RPS", "3500")),
+    max_attempts=int(os.getenv("S3_MAX_ATTEMPTS", "8"))
+)
+throttle_controller.attach(s3_client)
+
+# Cache for listings, stats, metadata and tags; off unless a backend is chosen, since a
+# per-process cache would serve entries other workers have already invalidated
+cache = create_cache(
+    os.getenv("CACHE_BACKEND", "none"),
+    os.getenv("CACHE_PATH", ".cache/s3_cache.db"),
+    float(os.getenv("CACHE_TTL", "60"))
+)
+
+# Concurrent sharded listing for whole-bucket and whole-folder scans
+lister = ShardedLister(
+    s3_client,
+    max_workers=int(os.getenv("LIST_MAX_WORKERS", "16")),
+    throttle=throttle_controller
+)
+
+# Identical concurrent reads share one S3 call
+single_flight = SingleFlight(float(os.getenv("SINGLE_FLIGHT_TIMEOUT", "30")))
+# Stats, folder sizes and listings scan every object below them, so waiters on them get longer than other reads
+scan_timeout = float(os.getenv("SCAN_TIMEOUT", "300"))
+
+# Parallel ranged GETs for large downloads
+downloader = RangedDownloader(
+    s3_client,
+    part_size=int(os.getenv("DOWNLOAD_PART_SIZE", str(8 * 1024 * 1024))),
+    parallelism=int(os.getenv("DOWNLOAD_PARALLELISM", "8")),
+    threshold=int(os.getenv("DOWNLOAD_THRESHOLD", str(16 * 1024 * 1024))),
+    throttle=throttle_controller
+)
+
+# Server-side extraction of uploaded archives
+archive_uploader = ArchiveUploader(
+    s3_client,
+    max_in_flight=int(os.getenv("EXTRACT_MAX_IN_FLIGHT", "16")),
+    multipart_threshold=int(os.getenv("EXTRACT_MULTIPART_THRESHOLD", str(16 * 1024 * 1024))),
+    part_size=int(os.getenv("EXTRACT_PART_SIZE", str(8 * 1024 * 1024))),
+    throttle=throttle_controller
+)
+
 def get_file_metadata(bucket: str, key: str) -> dict:
     """Retrieve metadata for an S3 object."""
+    cache_key = f"metadata:{bucket}/{key}"
+    metadata = cache.get(cache_key)
+    if metadata is not None:
+        return metadata
     try:
-        response = s3_client.head_object(Bucket=bucket, Key=key)
-        return {
-            'size': response['ContentLength'],
-            'last_modified': response['LastModified'].strftime('%Y-%m-%d %H:%M:%S'),
-            'content_type': response.get('ContentType', 'N/A'),
-            'etag': response['ETag'].strip('"')
-        }
+        try:
+            return single_flight.do(cache_key, _load_file_metadata, bucket, key)
+        except TimeoutError as e:
+            # A single HEAD is cheap; issue our own rather than report the object as having no metadata
+            logger.warning(f"{e}; reading {bucket}/{key} directly")
+            return _load_file_metadata(bucket, key)
     except ClientError as e:
         logger.error(f"Error getting metadata for {bucket}/{key}: {e}")
-        return {}
+    return {}
+
+def _load_file_metadata(bucket: str, key: str) -> dict:
+    # Taken before reading S3 so that writes landing mid-load keep the result out of the cache
+    started = time.time()
+    response = s3_client.head_object(Bucket=bucket, Key=key)
+    metadata = {
+        'size': response['ContentLength'],
+        'last_modified': response['LastModified'].strftime('%Y-%m-%d %H:%M:%S'),
+        'content_type': response.get('ContentType', 'N/A'),
+        'etag': response['ETag'].strip('"')
+    }
+    cache.set(f"metadata:{bucket}/{key}", metadata, started_at=started)
+    return metadata
+
+def get_object_tags(bucket: str, key: str) -> List[str]:
+    """Retrieve the tag values of an S3 object."""
+    cache_key = f"tags:{bucket}/{key}"
+    tags = cache.get(cache_key)
+    if tags is not None:
+        return tags
+    try:
+        return single_flight.do(cache_key, _load_object_tags, bucket, key)
+    except TimeoutError as e:
+        logger.warning(f"{e}; reading {bucket}/{key} tags directly")
+        return _load_object_tags(bucket, key)
+
+def _load_object_tags(bucket: str, key: str) -> List[str]:
+    started = time.time()
+    tag_response = s3_client.get_object_tagging(Bucket=bucket, Key=key)
+    tags = [t['Value'] for t in tag_response.get('TagSet', [])]
+    cache.set(f"tags:{bucket}/{key}", tags, started_at=started)
+    return tags
 
 def get_folder_size(bucket: str, prefix: str) -> int:
-    """Calculate total size of objects in a folder."""
-    total_size = 0
+    """Calculate total size of objects in a folder, or 0 if it cannot be read."""
     try:
-        paginator = s3_client.get_paginator('list_objects_v2')
-        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
-            for obj in page.get('Contents', []):
-                total_size += obj['Size']
-    except ClientError as e:
+        return _folder_size(bucket, prefix)
+    except (ClientError, TimeoutError) as e:
         logger.error(f"Error calculating folder size for {bucket}/{prefix}: {e}")
+    return 0
+
+def _folder_size(bucket: str, prefix: str) -> int:
+    """Like get_folder_size, but raise instead of guessing 0."""
+    cache_key = f"folder_size:{bucket}/{prefix}"
+    total_size = cache.get(cache_key)
+    if total_size is not None:
+        return total_size
+    return single_flight.do(cache_key, _load_folder_size, bucket, prefix, timeout=scan_timeout)
+
+def _load_folder_size(bucket: str, prefix: str) -> int:
+    started = time.time()
+    total_size = sum(obj['Size'] for obj in lister.iter_objects(bucket, prefix))
+    cache.set(f"folder_size:{bucket}/{prefix}", total_size, started_at=started)
     return total_size
 
+def list_directory(bucket: str, prefix: str) -> Dict[str, List[Dict]]:
+    """List the folders and files directly under a prefix."""
+    cache_key = f"listing:{bucket}/{prefix}"
+    listing = cache.get(cache_key)
+    if listing is not None:
+        return listing
+    return single_flight.do(cache_key, _load_directory, bucket, prefix, timeout=scan_timeout)
+
+def _load_directory(bucket: str, prefix: str) -> Dict[str, List[Dict]]:
+    started = time.time()
+    folders = []
+    objects = []
+    complete = True
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter='/'):
+        for folder in page.get('CommonPrefixes', []):
+            folder_key = folder['Prefix']
+            try:
+                size = _folder_size(bucket, folder_key)
+            except (ClientError, TimeoutError) as e:
+                logger.error(f"Error calculating folder size for {bucket}/{folder_key}: {e}")
+                # Still shown, but a listing with a made-up size must not be cached
+                size = 0
+                complete = False
+            folders.append({
+                'Key': folder_key,
+                'Size': size
+            })
+        for obj in page.get('Contents', []):
+            objects.append({
+                'Key': obj['Key'],
+                'LastModified': obj['LastModified'].strftime('%Y-%m-%d %H:%M:%S'),
+                'Size': obj['Size'],
+                'Type': 'File'
+            })
+    listing = {'folders': folders, 'objects': objects}
+    if complete:
+        cache.set(f"listing:{bucket}/{prefix}", listing, started_at=started)
+    return listing
+
+def get_bucket_stats(bucket: str) -> dict:
+    """Calculate size, file count, folder count and last modified date of a bucket."""
+    cache_key = f"stats:{bucket}/"
+    stats = cache.get(cache_key)
+    if stats is not None:
+        return stats
+    return single_flight.do(cache_key, _load_bucket_stats, bucket, timeout=scan_timeout)
+
+def _load_bucket_stats(bucket: str) -> dict:
+    started = time.time()
+    total_size = 0
+    file_count = 0
+    folder_count = 0
+    last_modified = None
+    for obj in lister.iter_objects(bucket):
+        total_size += obj['Size']
+        file_count += 1
+        if not last_modified or obj['LastModified'] > last_modified:
+            last_modified = obj['LastModified']
+    folder_paginator = s3_client.get_paginator('list_objects_v2')
+    for page in folder_paginator.paginate(Bucket=bucket, Delimiter='/'):
+        folder_count += len(page.get('CommonPrefixes', []))
+    stats = {
+        'name': bucket,
+        'total_size': total_size,
+        'file_count': file_count,
+        'folder_count': folder_count,
+        'last_modified': last_modified.strftime('%Y-%m-%d %H:%M:%S') if last_modified else 'N/A'
+    }
+    cache.set(f"stats:{bucket}/", stats, started_at=started)
+    return stats
+
+def invalidate_object(bucket: str, key: str):
+    """Evict cached entries made stale by a write to bucket/key."""
+    keys = [f"metadata:{bucket}/{key}", f"tags:{bucket}/{key}", f"stats:{bucket}/"]
+    prefixes = []
+    if key.endswith('/'):
+        prefixes = [f"{namespace}:{bucket}/{key}" for namespace in ('metadata', 'tags', 'folder_size', 'listing')]
+    keys += _ancestor_entries(bucket, key)
+    cache.delete_many(keys, prefixes)
+
+def invalidate_objects(bucket: str, keys: Iterable[str]):
+    """Evict cached entries made stale by a bulk write, once for the whole batch.
+
+    Metadata and tags are evicted per parent folder rather than per key, so
+    the cost follows the number of folders touched, not the number of keys.
+    """
+    entries = {f"stats:{bucket}/"}
+    prefixes = set()
+    for key in keys:
+        parent = key.rstrip('/').rpartition('/')[0]
+        parent = f"{parent}/" if parent else ''
+        prefixes.update(f"{namespace}:{bucket}/{parent}" for namespace in ('metadata', 'tags'))
+        if key.endswith('/'):
+            prefixes.update(f"{namespace}:{bucket}/{key}" for namespace in ('folder_size', 'listing'))
+        entries.update(_ancestor_entries(bucket, key))
+    # A prefix already covered by a shorter one adds nothing
+    prefixes = [p for p in prefixes if not any(p != q and p.startswith(q) for q in prefixes)]
+    cache.delete_many(entries, prefixes)
+
+def _ancestor_entries(bucket: str, key: str) -> List[str]:
+    """Listing and folder size entries of every folder above key, up to the bucket root."""
+    parts = key.rstrip('/').split('/')[:-1]
+    entries = []
+    for depth in range(len(parts) + 1):
+        ancestor = ''.join(f"{part}/" for part in parts[:depth])
+        entries += [f"listing:{bucket}/{ancestor}", f"folder_size:{bucket}/{ancestor}"]
+    return entries
+
+def invalidate_bucket(bucket: str):
+    """Evict every cached entry for a bucket."""
+    cache.delete_many(prefixes=[f"{namespace}:{bucket}/" for namespace in ('metadata', 'tags', 'folder_size', 'listing', 'stats')])
+
+def delete_object(bucket: str, key: str):
+    """Delete an S3 object and evict the cache entries it invalidates."""
+    try:
+        s3_client.delete_object(Bucket=bucket, Key=key)
+    finally:
+        invalidate_object(bucket, key)
+
+def copy_object(bucket: str, key: str, dest_key: str):
+    """Copy an S3 object within a bucket and evict the cache entries it invalidates."""
+    try:
+        s3_client.copy_object(Bucket=bucket, CopySource={'Bucket': bucket, 'Key': key}, Key=dest_key)
+    finally:
+        invalidate_object(bucket, dest_key)
+
 def generate_presigned_url(bucket: str, key: str, expires_in: int) -> str:
     """Generate a pre-signed URL for an S3 object."""
     try:
@@ -66,4 +295,52 @@ def generate_presigned_url(bucket: str, key: str, expires_in: int) -> str:
         return url
     except ClientError as e:
         logger.error(f"Error generating pre-signed URL for {bucket}/{key}: {e}")
-        raise
\ No newline at end of file
+        raise
+
+def delete_objects(bucket: str, keys: List[str]) -> List[str]:
+    """Delete keys with DeleteObjects, up to 1000 per request, and return the keys S3 could not delete."""
+    failed = []
+    try:
+        for start in range(0, len(keys), 1000):
+            failed += _delete_batch(bucket, keys[start:start + 1000])
+    finally:
+        invalidate_objects(bucket, keys)
+    return failed
+
+def _delete_batch(bucket: str, keys: List[str]) -> List[str]:
+    failed = []
+    for attempt in range(1, throttle_controller.max_attempts + 1):
+        response = throttle_controller.call(
+            bucket,
+            keys[0],
+            s3_client.delete_objects,
+            Bucket=bucket,
+            Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
+        )
+        # The request succeeds as a whole; throttling and other failures come back per key
+        errors = response.get('Errors', [])
+        throttled = [error['Key'] for error in errors if error.get('Code') in THROTTLE_ERROR_CODES]
+        for error in errors:
+            if error.get('Code') not in THROTTLE_ERROR_CODES or attempt == throttle_controller.max_attempts:
+                logger.error(f"Error deleting {bucket}/{error['Key']}: {error.get('Code')} {error.get('Message')}")
+                failed.append(error['Key'])
+        if not throttled or attempt == throttle_controller.max_attempts:
+            break
+        limiter = throttle_controller.limiter(bucket, keys[0])
+        with limiter.condition:
+            limiter.decrease()
+        time.sleep(throttle_controller.backoff(attempt))
+        keys = throttled
+    return failed
+
+def delete_prefix(bucket: str, prefix: str) -> List[str]:
+    """Delete every object under a prefix, including the folder marker, and return the keys that failed."""
+    failed = []
+    try:
+        for batch in lister.iter_batches(bucket, prefix):
+            failed += delete_objects(bucket, [obj['Key'] for obj in batch])
+        throttle_controller.call(bucket, prefix, s3_client.delete_object, Bucket=bucket, Key=prefix)
+    finally:
+        # Evicting the folder covers every key under it
+        invalidate_object(bucket, prefix)
+    return failed
\ No newline at end of file
@@ -0,0 +1,61 @@
+import threading
+import logging
+from typing import Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+class _Call:
+    """One in-flight call whose outcome is shared by every waiter."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+class SingleFlight:
+    """Collapse identical concurrent calls into one.
+
+    The first caller for a key runs the function; callers arriving while it
+    is still running wait for and share its result or exception instead of
+    issuing the same S3 request again.
+    """
+
+    def __init__(self, default_timeout: float = 30.0):
+        self.default_timeout = default_timeout
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, func: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        """Run func(*args, **kwargs) once for all concurrent callers with the same key.
+
+        Waiters raise TimeoutError if the shared call takes longer than timeout
+        seconds (the default timeout when None).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                call.waiters += 1
+        if leader:
+            try:
+                call.result = func(*args, **kwargs)
+                return call.result
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                if call.waiters:
+                    logger.debug(f"Shared result of {key} with {call.waiters} waiting caller(s)")
+                call.done.set()
+        wait = self.default_timeout if timeout is None else timeout
+        if not call.done.wait(wait):
+            raise TimeoutError(f"Timed out after {wait}s waiting for in-flight call {key}")
+        if call.error is not None:
+            raise call.error
+        return call.result
@@ -0,0 +1,193 @@
+import random
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_ERROR_CODES = {
+    'SlowDown',
+    'Throttling',
+    'ThrottlingException',
+    'RequestLimitExceeded',
+    'TooManyRequestsException',
+    'ServiceUnavailable',
+    '503',
+}
+
+def is_throttle_error(error: Exception) -> bool:
+    """Return True when an exception is an S3 throttling response."""
+    if not isinstance(error, ClientError):
+        return False
+    code = error.response.get('Error', {}).get('Code', '')
+    status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+    return code in THROTTLE_ERROR_CODES or status == 503
+
+class _PartitionLimiter:
+    """AIMD concurrency window plus a token bucket for one bucket/prefix partition."""
+
+    def __init__(self, initial: float, minimum: float, maximum: float, max_rps: float, cooldown: float):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.max_rps = max_rps
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.tokens = max_rps
+        self.refilled_at = time.monotonic()
+        self.decreased_at = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= max(int(self.limit), 1):
+                self.condition.wait()
+            self.in_flight += 1
+        self._take_token()
+
+    def release(self, throttled: bool):
+        with self.condition:
+            self.in_flight -= 1
+            if throttled:
+                self.decrease()
+            else:
+                # Additive increase: roughly one extra slot per window of successful calls
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self.condition.notify_all()
+
+    def decrease(self):
+        """Halve the window, at most once per cooldown so one burst of 503s counts once."""
+        now = time.monotonic()
+        if now - self.decreased_at >= self.cooldown:
+            self.limit = max(self.minimum, self.limit / 2)
+            self.decreased_at = now
+
+    def _take_token(self):
+        if not self.max_rps:
+            return
+        while True:
+            with self.condition:
+                now = time.monotonic()
+                self.tokens = min(self.max_rps, self.tokens + (now - self.refilled_at) * self.max_rps)
+                self.refilled_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.max_rps
+            time.sleep(wait)
+
+class ThrottleController:
+    """Shared backpressure for bulk S3 operations.
+
+    Each bucket/top-level-prefix partition gets its own AIMD concurrency window
+    and requests-per-second cap. Throttling responses seen by botocore's retry
+    handler shrink the window and are retried after a full-jitter exponential
+    backoff; successful calls grow the window back towards the maximum.
+    """
+
+    def __init__(
+        self,
+        initial_concurrency: int = 8,
+        min_concurrency: int = 1,
+        max_concurrency: int = 64,
+        max_rps: float = 3500.0,
+        base_delay: float = 0.05,
+        max_delay: float = 20.0,
+        max_attempts: int = 8,
+        cooldown: float = 1.0
+    ):
+        self.initial_concurrency = initial_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_rps = max_rps
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.cooldown = cooldown
+        self._limiters: Dict[Tuple[str, str], _PartitionLimiter] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @staticmethod
+    def partition(bucket: str, key: str = "") -> Tuple[str, str]:
+        """Map a key to the bucket/prefix partition S3 throttles on."""
+        return bucket, key.split('/', 1)[0] if '/' in key else ''
+
+    def limiter(self, bucket: str, key: str = "") -> _PartitionLimiter:
+        partition = self.partition(bucket, key)
+        with self._lock:
+            limiter = self._limiters.get(partition)
+            if limiter is None:
+                limiter = _PartitionLimiter(
+                    self.initial_concurrency,
+                    self.min_concurrency,
+                    self.max_concurrency,
+                    self.max_rps,
+                    self.cooldown
+                )
+                self._limiters[partition] = limiter
+            return limiter
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff delay for a retry attempt (1-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    @contextmanager
+    def slot(self, bucket: str, key: str = ""):
+        """Hold one concurrency slot for a single S3 request against bucket/key."""
+        limiter = self.limiter(bucket, key)
+        limiter.acquire()
+        previous = getattr(self._local, 'limiter', None)
+        self._local.limiter = limiter
+        throttled = False
+        try:
+            yield limiter
+        except Exception as e:
+            throttled = is_throttle_error(e)
+            raise
+        finally:
+            self._local.limiter = previous
+            limiter.release(throttled)
+
+    def call(self, bucket: str, key: str, func: Callable, *args, **kwargs):
+        """Run func under a slot for bucket/key and return its result."""
+        with self.slot(bucket, key):
+            return func(*args, **kwargs)
+
+    def map(self, bucket: str, func: Callable[[str], object], keys: Iterable[str]) -> List:
+        """Apply func to every key concurrently, paced by the adaptive window.
+
+        Results are returned in input order; the first exception is re-raised.
+        """
+        keys = list(keys)
+        if not keys:
+            return []
+        workers = min(self.max_concurrency, len(keys))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda key: self.call(bucket, key, func, key), keys))
+
+    def attach(self, client):
+        """Hook the controller into a botocore client's retry events."""
+        client.meta.events.register_first('needs-retry.s3', self._on_needs_retry)
+
+    def _on_needs_retry(self, response=None, attempts: int = 0, caught_exception: Optional[Exception] = None, **kwargs):
+        if response is None:
+            return None
+        http_response, parsed = response
+        code = parsed.get('Error', {}).get('Code', '')
+        if code not in THROTTLE_ERROR_CODES and http_response.status_code != 503:
+            return None
+        limiter = getattr(self._local, 'limiter', None)
+        if limiter is not None:
+            with limiter.condition:
+                limiter.decrease()
+        if attempts >= self.max_attempts:
+            logger.warning(f"Giving up after {attempts} throttled attempts ({code or http_response.status_code})")
+            return None
+        delay = self.backoff(attempts)
+        logger.debug(f"S3 throttled ({code or http_response.status_code}), retrying in {delay:.2f}s")
+        return delay
@@ -0,0 +1,207 @@
+import logging
+import mimetypes
+import tarfile
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+from boto3.s3.transfer import TransferConfig
+from utils.helpers import sanitize_member_path
+from utils.throttle import ThrottleController
+
+logger = logging.getLogger(__name__)
+
+class RangedDownloader:
+    """Stream S3 objects, splitting large ones into parallel ranged GETs.
+
+    Objects at or above ``threshold`` bytes are fetched as ``part_size``
+    byte ranges over up to ``parallelism`` pooled connections. Parts are
+    yielded strictly in order through a reorder window of ``parallelism``
+    parts, so memory stays at roughly ``parallelism * part_size`` per
+    download regardless of object size. Smaller objects use a single GET.
+    """
+
+    def __init__(
+        self,
+        client,
+        part_size: int = 8 * 1024 * 1024,
+        parallelism: int = 8,
+        threshold: int = 16 * 1024 * 1024,
+        chunk_size: int = 1024 * 1024,
+        throttle: Optional[ThrottleController] = None
+    ):
+        self.client = client
+        self.part_size = part_size
+        self.parallelism = parallelism
+        self.threshold = threshold
+        self.chunk_size = chunk_size
+        self.throttle = throttle
+
+    def iter_object(self, bucket: str, key: str, size: Optional[int] = None, etag: Optional[str] = None) -> Iterator[bytes]:
+        """Yield the bytes of bucket/key in order."""
+        if size is None:
+            head = self.client.head_object(Bucket=bucket, Key=key)
+            size = head['ContentLength']
+            etag = head['ETag']
+        if size < self.threshold or self.parallelism <= 1:
+            yield from self._iter_single(bucket, key)
+        else:
+            yield from self._iter_ranges(bucket, key, size, etag)
+
+    def _iter_single(self, bucket: str, key: str) -> Iterator[bytes]:
+        response = self.client.get_object(Bucket=bucket, Key=key)
+        try:
+            yield from response['Body'].iter_chunks(self.chunk_size)
+        finally:
+            response['Body'].close()
+
+    def _iter_ranges(self, bucket: str, key: str, size: int, etag: Optional[str]) -> Iterator[bytes]:
+        ranges = ((start, min(start + self.part_size, size) - 1) for start in range(0, size, self.part_size))
+        executor = ThreadPoolExecutor(max_workers=self.parallelism)
+        window = deque()
+        try:
+            for byte_range in ranges:
+                window.append(executor.submit(self._fetch_range, bucket, key, byte_range, etag))
+                if len(window) >= self.parallelism:
+                    yield window.popleft().result()
+            while window:
+                yield window.popleft().result()
+        finally:
+            # Client went away or a part failed: drop the parts nobody will read
+            for future in window:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _fetch_range(self, bucket: str, key: str, byte_range: tuple, etag: Optional[str]) -> bytes:
+        params = {'Bucket': bucket, 'Key': key, 'Range': f"bytes={byte_range[0]}-{byte_range[1]}"}
+        if etag:
+            # Fail instead of stitching together parts of two different versions
+            params['IfMatch'] = etag
+        if self.throttle:
+            return self.throttle.call(bucket, key, self._read, params)
+        return self._read(params)
+
+    def _read(self, params: dict) -> bytes:
+        response = self.client.get_object(**params)
+        with response['Body'] as body:
+            return body.read()
+
+class ArchiveUploader:
+    """Extract a ZIP or tar(.gz/.bz2/.xz) archive into S3 member by member.
+
+    Members are read from the archive sequentially. Small members are PUT
+    through a pool of at most ``max_in_flight`` concurrent uploads. Members of
+    ``multipart_threshold`` bytes or more stream through a multipart upload
+    with ``part_size`` parts. Memory is bounded by the uploads in flight,
+    not by the size of the archive.
+    """
+
+    TAR_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+    def __init__(
+        self,
+        client,
+        max_in_flight: int = 16,
+        multipart_threshold: int = 16 * 1024 * 1024,
+        part_size: int = 8 * 1024 * 1024,
+        throttle: Optional[ThrottleController] = None
+    ):
+        self.client = client
+        self.max_in_flight = max_in_flight
+        self.multipart_threshold = multipart_threshold
+        self.part_size = part_size
+        self.throttle = throttle
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=part_size,
+            max_concurrency=max_in_flight
+        )
+
+    @classmethod
+    def is_supported(cls, filename: str) -> bool:
+        return filename.lower().endswith(('.zip',) + cls.TAR_SUFFIXES)
+
+    def upload(self, fileobj: BinaryIO, filename: str, bucket: str, prefix: str = "") -> Tuple[List[str], List[str]]:
+        """Write every file in the archive to bucket/prefix/member_path.
+
+        Returns the keys written and the member paths skipped, either because
+        they resolve outside the archive root or because they map to a key an
+        earlier member already wrote.
+        """
+        name = filename.lower()
+        if name.endswith('.zip'):
+            return self._upload_members(self._iter_zip(fileobj), bucket, prefix)
+        if name.endswith(self.TAR_SUFFIXES):
+            return self._upload_members(self._iter_tar(fileobj), bucket, prefix)
+        raise ValueError(f"Unsupported archive type: {filename}")
+
+    @staticmethod
+    def _iter_zip(fileobj: BinaryIO) -> Iterator[Tuple[str, int, BinaryIO]]:
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.flag_bits & 0x1:
+                    # archive.open would raise RuntimeError asking for a password
+                    raise zipfile.BadZipFile(f"Encrypted member {info.filename} is not supported")
+                if not info.is_dir():
+                    with archive.open(info) as member:
+                        yield info.filename, info.file_size, member
+
+    @staticmethod
+    def _iter_tar(fileobj: BinaryIO) -> Iterator[Tuple[str, int, BinaryIO]]:
+        # Stream mode: members are read strictly in order, no seeking back
+        with tarfile.open(fileobj=fileobj, mode='r|*') as archive:
+            for info in archive:
+                if info.isfile():
+                    yield info.name, info.size, archive.extractfile(info)
+
+    def _upload_members(self, members: Iterator[Tuple[str, int, BinaryIO]], bucket: str, prefix: str) -> Tuple[List[str], List[str]]:
+        keys = []
+        skipped = []
+        written = set()
+        futures = []
+        slots = threading.BoundedSemaphore(self.max_in_flight)
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            for path, size, stream in members:
+                member_path = sanitize_member_path(path)
+                key = f"{prefix}{member_path}"
+                if not member_path or key in written:
+                    logger.warning(f"Skipping archive member {path}: {'duplicate key ' + key if member_path else 'path outside archive'}")
+                    skipped.append(path)
+                    continue
+                written.add(key)
+                content_type, _ = mimetypes.guess_type(member_path)
+                content_type = content_type or 'application/octet-stream'
+                if size >= self.multipart_threshold:
+                    logger.debug(f"Multipart upload of archive member {path} to {bucket}/{key}")
+                    self._upload_stream(bucket, key, stream, content_type)
+                else:
+                    # Take the slot before reading so at most max_in_flight bodies are held in memory
+                    slots.acquire()
+                    try:
+                        body = stream.read()
+                        future = executor.submit(self._put, bucket, key, body, content_type)
+                    except BaseException:
+                        slots.release()
+                        raise
+                    future.add_done_callback(lambda _: slots.release())
+                    futures.append(future)
+                keys.append(key)
+                for future in [f for f in futures if f.done()]:
+                    # Surface failures early instead of extracting the rest of the archive
+                    future.result()
+                    futures.remove(future)
+            for future in futures:
+                future.result()
+        return keys, skipped
+
+    def _upload_stream(self, bucket: str, key: str, stream: BinaryIO, content_type: str):
+        kwargs = {'ExtraArgs': {'ContentType': content_type}, 'Config': self.transfer_config}
+        if self.throttle:
+            return self.throttle.call(bucket, key, self.client.upload_fileobj, stream, bucket, key, **kwargs)
+        return self.client.upload_fileobj(stream, bucket, key, **kwargs)
+
+    def _put(self, bucket: str, key: str, body: bytes, content_type: str):
+        if self.throttle:
+            return self.throttle.call(bucket, key, self.client.put_object, Bucket=bucket, Key=key, Body=body, ContentType=content_type)
+        return self.client.put_object(Bucket=bucket, Key=key, Body=body, ContentType=content_type)